@@ -0,0 +1 @@
+# agents package: lets `uvicorn agents.<module>:app` run from the repo root.
@@ -0,0 +1,91 @@
+# a2a_common.py
+# Helpers shared by the Router, Data and Support agents (imported as agents.a2a_common
+# or as a sibling module, so `uvicorn agents.x:app`, `python agents/x.py` and --chdir all work).
+
+from fastapi import Request, Response
+from typing import Any, Awaitable, Callable, Dict, Optional
+import hashlib
+import os
+import httpx
+import orjson
+import time
+
+# Set A2A_UDS_DIR (e.g. /tmp) to reach same-host services over unix sockets; unset = TCP
+UDS_DIR = os.getenv("A2A_UDS_DIR")
+
+# ----------------------
+# Shared async HTTP client (opened/closed with the app lifecycle)
+# ----------------------
+class SharedClient:
+    """Lazily opened httpx.AsyncClient; attribute access (post, get, ...) goes to the live client.
+
+    `uds_sockets` maps a base URL (e.g. "http://mcp") to a socket file name in UDS_DIR; the
+    mounts are only used when A2A_UDS_DIR is set.
+    """
+
+    def __init__(self, timeout: float, uds_sockets: Dict[str, str]):
+        self.timeout = timeout
+        self.uds_sockets = uds_sockets
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def open(self):
+        limits = httpx.Limits(max_keepalive_connections=64, max_connections=128)
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=limits,
+            headers={"content-type": "application/json"},
+            transport=httpx.AsyncHTTPTransport(retries=2, limits=limits),
+            mounts={
+                base: httpx.AsyncHTTPTransport(uds=os.path.join(UDS_DIR, sock), retries=2, limits=limits)
+                for base, sock in self.uds_sockets.items()
+            } if UDS_DIR else None,
+        )
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+
+    def __getattr__(self, name: str):
+        return getattr(self.client, name)
+
+# ----------------------
+# Response cache for static discovery endpoints (in-memory, ETag / 304 aware)
+# ----------------------
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check: a comma-separated list of (weak or strong) tags, or "*"."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+def cache(expire: int = 300):
+    """Serve a zero-argument doc builder from cached JSON bytes, rebuilt every `expire` seconds."""
+    def decorator(build: Callable[[], Any]) -> Callable[[Request], Awaitable[Response]]:
+        entry: Dict[str, Any] = {"expires_at": 0.0}
+
+        async def endpoint(request: Request) -> Response:
+            now = time.monotonic()
+            if entry["expires_at"] <= now:
+                body = orjson.dumps(build())
+                entry.update(body=body, etag='"%s"' % hashlib.sha1(body).hexdigest(), expires_at=now + expire)
+            headers = {"ETag": entry["etag"], "Cache-Control": f"public, max-age={expire}"}
+            if etag_matches(request.headers.get("if-none-match"), entry["etag"]):
+                return Response(status_code=304, headers=headers)
+            return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+        endpoint.__name__ = build.__name__
+        endpoint.__doc__ = build.__doc__
+        return endpoint
+    return decorator
+
+# ----------------------
+# MCP JSON-RPC
+# ----------------------
+# tools/call envelope, pre-encoded so each hop only serializes its arguments
+_RPC_CALL_PREFIX = b'{"jsonrpc":"2.0","id":"x","method":"tools/call","params":{"tool":'
+
+def rpc_call_body(tool: str, arguments: Dict[str, Any]) -> bytes:
+    return b"".join((_RPC_CALL_PREFIX, orjson.dumps(tool), b',"arguments":', orjson.dumps(arguments), b"}}"))
@@ -0,0 +1,50 @@
+# combined.py
+# Single ASGI app hosting the Router, Data and Support agents in one process.
+# Router -> Data/Support hops become direct function calls (A2A_INPROC=1); only MCP stays over HTTP.
+# Exposes: Router routes at /, Data agent under /data, Support agent under /support
+
+import os
+
+os.environ.setdefault("A2A_INPROC", "1")
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+
+# Same import style as the agents themselves, so router_agent's in-process calls hit these modules
+if __package__:
+    from . import data_agent, support_agent, router_agent
+else:
+    import data_agent
+    import support_agent
+    import router_agent
+
+app = FastAPI(title="Combined A2A Agents", version="1.0.1", default_response_class=ORJSONResponse)
+
+# Mounted sub-apps don't run their own startup/shutdown hooks, so drive them from here
+@app.on_event("startup")
+async def open_clients():
+    for agent in (data_agent, support_agent, router_agent):
+        await agent.open_client()
+
+@app.on_event("shutdown")
+async def close_clients():
+    for agent in (data_agent, support_agent, router_agent):
+        await agent.close_client()
+
+app.mount("/data", data_agent.app)
+app.mount("/support", support_agent.app)
+app.mount("/", router_agent.app)  # last: the root mount matches every remaining path
+
+if __name__ == "__main__":
+    import uvicorn
+    print("Combined agents on http://0.0.0.0:9101")
+    uvicorn.run(
+        "combined:app",
+        host="0.0.0.0",
+        port=9101,
+        loop="auto",  # uvloop when installed (not on Windows), else asyncio
+        http="auto",  # httptools when installed, else h11
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        limit_concurrency=1000,
+        timeout_keep_alive=30,
+    )
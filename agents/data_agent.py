@@ -1,40 +1,59 @@
 # data_agent.py
 # Customer Data Agent exposing A2A endpoints. It calls MCP server tools via HTTP JSON-RPC.
 
-from fastapi import FastAPI, Path
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
+from starlette.convertors import StringConvertor, register_url_convertor
 from pydantic import BaseModel
-from typing import Any, Dict, Optional, List
-import requests
+from typing import Any, Dict, Optional, List, TypedDict
+import os
+import orjson
+import re
+# Imported as agents.<name> (uvicorn agents.x:app) or as a top-level module (python agents/x.py, --chdir agents)
+if __package__:
+    from .a2a_common import UDS_DIR, SharedClient, cache, rpc_call_body
+else:
+    from a2a_common import UDS_DIR, SharedClient, cache, rpc_call_body
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 ASSISTANT_ID = "data"
-MCP_URL = "http://127.0.0.1:9010/mcp"
-HEALTH_URL = "http://127.0.0.1:9010/healthz"
+MCP_BASE = "http://mcp" if UDS_DIR else "http://127.0.0.1:9010"
+MCP_URL = f"{MCP_BASE}/mcp"
+HEALTH_URL = f"{MCP_BASE}/healthz"
+_NUMBER_RE = re.compile(r"\b(\d{1,10})\b")
+
+# ----------------------
+# Shared async HTTP client (opened/closed with the app lifecycle)
+# ----------------------
+client = SharedClient(timeout=15.0, uds_sockets={"http://mcp": "mcp.sock"})
+open_client = app.on_event("startup")(client.open)
+close_client = app.on_event("shutdown")(client.close)
 
 # ----------------------
 # A2A wrapper models (names required by instructor)
+# Response-only shapes are TypedDicts (plain dicts, no validation); Message validates input.
 # ----------------------
-class AgentProvider(BaseModel):
+class AgentProvider(TypedDict):
     name: str
     sdk: str
-    homepage: Optional[str] = None
+    homepage: Optional[str]
 
-class AgentSkill(BaseModel):
+class AgentSkill(TypedDict):
     name: str
     description: str
     inputs: Dict[str, str]
     outputs: Dict[str, str]
 
-class AgentCapabilities(BaseModel):
+class AgentCapabilities(TypedDict):
     a2a: bool
     tools: List[str]
     skills: List[AgentSkill]
 
-class AgentCard(BaseModel):
+class AgentCard(TypedDict):
     id: str
     name: str
-    version: str = "1.0"
+    version: str
     provider: AgentProvider
     endpoints: Dict[str, str]
 
@@ -47,10 +66,10 @@ class Message(BaseModel):
 # Basic health
 # ----------------------
 @app.get("/healthz")
-def healthz():
+async def healthz():
     try:
-        r = requests.get(HEALTH_URL, timeout=5)
-        ok = r.ok and r.json().get("ok")
+        r = await client.get(HEALTH_URL, timeout=5)
+        ok = r.is_success and orjson.loads(r.content).get("ok")
         return {"ok": bool(ok)}
     except Exception as e:
         return {"ok": False, "error": str(e)}
@@ -65,8 +84,7 @@ class A2ACall(BaseModel):
 # ----------------------
 # A2A discovery (existing simple card)
 # ----------------------
-@app.get("/card")
-def card():
+def _card_doc():
     return {
         "id": ASSISTANT_ID,
         "name": "Customer Data Agent",
@@ -76,16 +94,20 @@ def card():
         }
     }
 
+@app.get("/card")
+@cache(expire=300)
+def card():
+    return _card_doc()
+
 # ----------------------
 # A2A required endpoints with instructor names
 # ----------------------
-@app.get("/a2a/{assistant_id}/agent_card")
-def da_agent_card(assistant_id: str = Path(...)):
-    assert assistant_id == ASSISTANT_ID
+def _agent_card_doc():
     return AgentCard(
         id=ASSISTANT_ID,
         name="Customer Data Agent",
-        provider=AgentProvider(name="Custom FastAPI", sdk="A2A JSON-RPC over HTTP"),
+        version="1.0",
+        provider=AgentProvider(name="Custom FastAPI", sdk="A2A JSON-RPC over HTTP", homepage=None),
         endpoints={
             "card": "/a2a/{assistant_id}/agent_card",
             "capabilities": "/a2a/{assistant_id}/capabilities",
@@ -95,9 +117,12 @@ def da_agent_card(assistant_id: str = Path(...)):
         }
     )
 
-@app.get("/a2a/{assistant_id}/capabilities")
-def da_capabilities(assistant_id: str = Path(...)):
-    assert assistant_id == ASSISTANT_ID
+@app.get(f"/a2a/{ASSISTANT_ID}/agent_card")
+@cache(expire=300)
+def da_agent_card():
+    return _agent_card_doc()
+
+def _capabilities_doc():
     skills = [
         AgentSkill(
             name="get_customer",
@@ -129,35 +154,45 @@ def da_capabilities(assistant_id: str = Path(...)):
             inputs={"customer_id": "int"},
             outputs={"tickets": "list"},
         ),
+        AgentSkill(
+            name="batch",
+            description="Run dependent MCP tool calls in one round trip (tools/batch)",
+            inputs={"calls": "list[dict]"},
+            outputs={"results": "list"},
+        ),
     ]
-    return AgentCapabilities(a2a=True, tools=[s.name for s in skills], skills=skills)
+    return AgentCapabilities(a2a=True, tools=[s["name"] for s in skills], skills=skills)
 
-@app.post("/a2a/{assistant_id}/message")
-def da_message(msg: Message, assistant_id: str = Path(...)):
-    assert assistant_id == ASSISTANT_ID
+@app.get(f"/a2a/{ASSISTANT_ID}/capabilities")
+@cache(expire=300)
+def da_capabilities():
+    return _capabilities_doc()
+
+@app.post(f"/a2a/{ASSISTANT_ID}/message")
+async def da_message(msg: Message):
     # Minimal demo: if message contains a number, treat as customer id
-    import re
-    m = re.search(r"\b(\d{1,10})\b", (msg.content or ""))
+    m = _NUMBER_RE.search(msg.content or "")
     if m:
         cid = int(m.group(1))
-        return a2a_call(assistant_id, A2ACall(tool="get_customer", arguments={"customer_id": cid}))
+        return await a2a_call(A2ACall.model_construct(tool="get_customer", arguments={"customer_id": cid}))
     return {"ok": True, "note": "Message received (no auto rule matched)."}
 
-@app.get("/a2a/{assistant_id}/schema")
-def da_schema(assistant_id: str = Path(...)):
-    assert assistant_id == ASSISTANT_ID
+def _schema_doc():
     return {
-        "AgentCard": da_agent_card(assistant_id),
-        "AgentCapabilities": da_capabilities(assistant_id),
-        "ExampleMessage": Message(role="user", content="get customer 1")
+        "AgentCard": _agent_card_doc(),
+        "AgentCapabilities": _capabilities_doc(),
+        "ExampleMessage": {"role": "user", "content": "get customer 1", "meta": None}
     }
 
+@app.get(f"/a2a/{ASSISTANT_ID}/schema")
+@cache(expire=300)
+def da_schema():
+    return _schema_doc()
+
 # ----------------------
 # Existing tasks listing
 # ----------------------
-@app.get("/a2a/{assistant_id}/tasks")
-def a2a_tasks(assistant_id: str = Path(...)):
-    assert assistant_id == ASSISTANT_ID
+def _tasks_doc():
     return {
         "tasks": [
             {"name": "get_customer", "args": {"customer_id": "int"}},
@@ -165,28 +200,62 @@ def a2a_tasks(assistant_id: str = Path(...)):
             {"name": "update_customer", "args": {"customer_id": "int", "data": "dict"}},
             {"name": "create_ticket", "args": {"customer_id": "int", "issue": "str", "priority": "str"}},
             {"name": "get_customer_history", "args": {"customer_id": "int"}},
+            {"name": "batch", "args": {"calls": "list[dict]"}},
         ]
     }
 
+@app.get(f"/a2a/{ASSISTANT_ID}/tasks")
+@cache(expire=300)
+def a2a_tasks():
+    return _tasks_doc()
+
 # ----------------------
 # A2A call -> MCP tools
 # ----------------------
-@app.post("/a2a/{assistant_id}/call")
-def a2a_call(assistant_id: str, payload: A2ACall):
-    assert assistant_id == ASSISTANT_ID
-    tool = payload.tool
-    args = payload.arguments or {}
-    # Forward to MCP tools/call
-    body = {"jsonrpc": "2.0", "id": "x", "method": "tools/call", "params": {"tool": tool, "arguments": args}}
-    r = requests.post(MCP_URL, json=body, timeout=15)
-    if not r.ok:
+async def call_tool(tool: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    """Forward one A2A tool call to MCP (also used in-process by the combined app)."""
+    # "batch" forwards dependent calls to MCP tools/batch; everything else goes to tools/call
+    if tool == "batch":
+        body = {"jsonrpc": "2.0", "id": "x", "method": "tools/batch", "params": {"calls": args.get("calls", [])}}
+        content = orjson.dumps(body)
+    else:
+        content = rpc_call_body(tool, args)
+    r = await client.post(MCP_URL, content=content)
+    if not r.is_success:
         return {"ok": False, "error": f"mcp error: {r.status_code}"}
-    data = r.json()
+    data = orjson.loads(r.content)
     if "error" in data:
         return {"ok": False, "error": data["error"]}
     return data.get("result", {"ok": True})
 
+@app.post(f"/a2a/{ASSISTANT_ID}/call")
+async def a2a_call(payload: A2ACall):
+    return await call_tool(payload.tool, payload.arguments or {})
+
+# ----------------------
+# Any other assistant id is not served by this agent
+# ----------------------
+class OtherAssistantConvertor(StringConvertor):
+    """Path segment that is anything but ASSISTANT_ID, so our own paths keep their 404/405s."""
+    regex = f"(?!{re.escape(ASSISTANT_ID)}/)[^/]+"
+
+register_url_convertor("not_data", OtherAssistantConvertor())
+
+@app.api_route("/a2a/{assistant_id:not_data}/{rest:path}", methods=["GET", "POST"])
+def unknown_assistant(assistant_id: str, rest: str):
+    raise HTTPException(status_code=404, detail=f"Unknown assistant: {assistant_id}")
+
 if __name__ == "__main__":
     import uvicorn
-    print("Data agent on http://0.0.0.0:9102")
-    uvicorn.run(app, host="0.0.0.0", port=9102)
+    # Same-host peers can reach this service over a unix socket instead of loopback TCP
+    bind = {"uds": os.path.join(UDS_DIR, "data_agent.sock")} if UDS_DIR else {"host": "0.0.0.0", "port": 9102}
+    print(f"Data agent on {bind.get('uds') or 'http://0.0.0.0:9102'}")
+    uvicorn.run(
+        "data_agent:app",
+        **bind,
+        loop="auto",  # uvloop when installed (not on Windows), else asyncio
+        http="auto",  # httptools when installed, else h11
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        limit_concurrency=1000,
+        timeout_keep_alive=30,
+    )
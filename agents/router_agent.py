@@ -3,35 +3,59 @@
 # Exposes: /healthz, /a2a/router/agent_card, /a2a/router/call, /a2a/router/message
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from typing import Any, Dict, List, Optional
-import requests
+from typing import Any, Dict, List, Optional, TypedDict
+from functools import lru_cache
+from itertools import islice
+import io
+import os
+import orjson
 import uvicorn
 import re
-
-DATA_BASE = "http://127.0.0.1:9102"
-SUPPORT_BASE = "http://127.0.0.1:9103"
-
-app = FastAPI(title="Router Agent", version="1.0.1")
-
-# ---------- A2A wrapper object names ----------
+# Imported as agents.<name> (uvicorn agents.x:app) or as a top-level module (python agents/x.py, --chdir agents)
+if __package__:
+    from .a2a_common import UDS_DIR, SharedClient, cache
+else:
+    from a2a_common import UDS_DIR, SharedClient, cache
+
+# A2A_UDS_DIR (see a2a_common) switches same-host agent hops to unix sockets
+DATA_BASE = "http://data" if UDS_DIR else "http://127.0.0.1:9102"
+SUPPORT_BASE = "http://support" if UDS_DIR else "http://127.0.0.1:9103"
+# Set A2A_INPROC=1 when Data/Support are hosted in this process (see combined.py)
+INPROC = os.getenv("A2A_INPROC") == "1"
+if INPROC:
+    if __package__:
+        from . import data_agent, support_agent
+    else:
+        import data_agent
+        import support_agent
+
+app = FastAPI(title="Router Agent", version="1.0.1", default_response_class=ORJSONResponse)
+
+# ---------- Shared async HTTP client (opened/closed with the app lifecycle) ----------
+client = SharedClient(timeout=25.0, uds_sockets={"http://data": "data_agent.sock", "http://support": "support_agent.sock"})
+open_client = app.on_event("startup")(client.open)
+close_client = app.on_event("shutdown")(client.close)
+
+# ---------- A2A wrapper object names (response-only shapes are TypedDicts) ----------
 class Message(BaseModel):
     role: str
     content: str
 
-class AgentSkill(BaseModel):
+class AgentSkill(TypedDict):
     name: str
     description: str
 
-class AgentCapability(BaseModel):
+class AgentCapability(TypedDict):
     type: str
     tools: List[str]
 
-class AgentProvider(BaseModel):
+class AgentProvider(TypedDict):
     name: str
     version: str
 
-class AgentCard(BaseModel):
+class AgentCard(TypedDict):
     id: str
     name: str
     description: str
@@ -51,8 +75,7 @@ def healthz():
     return {"ok": True}
 
 
-@app.get("/a2a/router/agent_card", response_model=AgentCard)
-def agent_card():
+def _agent_card_doc() -> AgentCard:
     return AgentCard(
         id="router-agent",
         name="Router Agent",
@@ -71,18 +94,30 @@ def agent_card():
     )
 
 
-def data_call(tool: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-    r = requests.post(f"{DATA_BASE}/a2a/data/call", json={"tool": tool, "arguments": arguments}, timeout=25)
-    r.raise_for_status()
-    js = r.json()
+@app.get("/a2a/router/agent_card")
+@cache(expire=300)
+def agent_card():
+    return _agent_card_doc()
+
+
+async def data_call(tool: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    if INPROC:
+        js = await data_agent.call_tool(tool, arguments)
+    else:
+        r = await client.post(f"{DATA_BASE}/a2a/data/call", content=orjson.dumps({"tool": tool, "arguments": arguments}))
+        r.raise_for_status()
+        js = orjson.loads(r.content)
     if "error" in js:
         raise RuntimeError(js["error"])
     return js.get("result", js)
 
-def support_call(tool: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-    r = requests.post(f"{SUPPORT_BASE}/a2a/support/call", json={"tool": tool, "arguments": arguments}, timeout=25)
-    r.raise_for_status()
-    js = r.json()
+async def support_call(tool: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    if INPROC:
+        js = await support_agent.call_tool(tool, arguments)
+    else:
+        r = await client.post(f"{SUPPORT_BASE}/a2a/support/call", content=orjson.dumps({"tool": tool, "arguments": arguments}))
+        r.raise_for_status()
+        js = orjson.loads(r.content)
     if "error" in js:
         raise RuntimeError(js["error"])
     return js.get("result", js)
@@ -90,46 +125,84 @@ def support_call(tool: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
 
 def build_response(payload: Dict[str, Any]) -> Dict[str, Any]:
     """Return payload with legacy fields plus a `result` mirror for strict A2A clients."""
-    cloned = dict(payload)
-    cloned["result"] = dict(payload)
-    return cloned
-
-
+    return payload | {"result": payload}
+
+
+# ---------- Precompiled patterns ----------
+_DATA_ID_RE = re.compile(r"id\s+(\d+)")
+_CUSTOMER_ID_RE = re.compile(r"customer\s+(\d+)")
+_EMAIL_RE = re.compile(r"update my email to ([^\s]+)")
+
+# MULTI_UPDATE reply templates; each ticket entry is preceded by a blank line
+_HISTORY_HEADER = "Your email has been successfully updated to {}.\n\nHere is your ticket history:\n"
+_TICKET_ENTRY = (
+    "\n{0}. **Ticket ID:** {1} \n"
+    "   - **Issue:** {2} \n"
+    "   - **Status:** {3} \n"
+    "   - **Priority:** {4} \n"
+    "   - **Created At:** {5}\n"
+)
+
+# Keyword bit flags; classify_intent ORs them into one mask per query
+_KW_ACTIVE = 0x1
+_KW_OPEN = 0x2
+_KW_UPDATE_EMAIL = 0x4
+_KW_HISTORY = 0x8
+_KW_UPGRADE = 0x10
+_KW_ESCALATION = 0x20
+
+_MASK_MULTI_OPEN = _KW_ACTIVE | _KW_OPEN
+_MASK_MULTI_UPDATE = _KW_UPDATE_EMAIL | _KW_HISTORY
+
+_INTENT_KEYWORDS = {
+    "active customers": _KW_ACTIVE,
+    "open ticket": _KW_OPEN,  # also matches "open tickets"
+    "update my email": _KW_UPDATE_EMAIL,
+    "ticket history": _KW_HISTORY,
+    "upgrade": _KW_UPGRADE,
+    "upgrading my account": _KW_UPGRADE,
+    "charged twice": _KW_ESCALATION,
+    "refund": _KW_ESCALATION,
+    "cancel": _KW_ESCALATION,
+    "billing": _KW_ESCALATION,
+}
+# Zero-width lookahead so overlapping keywords ("open ticket history") are all reported
+_INTENT_RE = re.compile(
+    "(?=(" + "|".join(re.escape(k) for k in sorted(_INTENT_KEYWORDS, key=len, reverse=True)) + "))"
+)
+
+
+@lru_cache(maxsize=4096)  # pure in `text`; bounded so adversarial inputs can't grow it
 def classify_intent(text: str) -> str:
     """Return one of: DATA, SUPPORT, MULTI_OPEN, MULTI_COORD, MULTI_UPDATE."""
-    t = text.lower()
+    # One regex pass builds a bitmap of every keyword present in the text
+    mask = 0
+    for m in _INTENT_RE.finditer(text.lower()):
+        mask |= _INTENT_KEYWORDS[m.group(1)]
 
     # Complex report: active customers with open tickets
-    if ("active customers" in t and "open ticket" in t) or ("active customers" in t and "open tickets" in t):
+    if mask & _MASK_MULTI_OPEN == _MASK_MULTI_OPEN:
         return "MULTI_OPEN"
 
     # Multi-intent: update email + show ticket history
-    if "update my email" in t and "ticket history" in t:
+    if mask & _MASK_MULTI_UPDATE == _MASK_MULTI_UPDATE:
         return "MULTI_UPDATE"
 
     # Coordinated: upgrade account style
-    if "upgrade" in t or "upgrading my account" in t:
+    if mask & _KW_UPGRADE:
         return "MULTI_COORD"
 
     # Escalation / billing-like
-    if "charged twice" in t or "refund" in t or "cancel" in t or "billing" in t:
+    if mask & _KW_ESCALATION:
         return "SUPPORT"
 
-    # Simple data fetch
-    if "get customer information" in t or "get customer info" in t or "customer id" in t:
-        return "DATA"
-
+    # Simple data fetch ("get customer information", "customer id", ...) and default
     return "DATA"
 
 
-@app.post("/a2a/router/call")
-def router_call(req: A2ACallRequest):
-    tool = req.tool
-    args = req.arguments or {}
-    if tool not in {"route_task", "route"}:
-        return {"error": f"Unknown tool: {tool}"}
-
-    query = str(args.get("text", ""))
+async def _route(query: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    """Classify `query` and run the matching Data/Support flow (shared by /call and /message)."""
+    query_lower = query.lower()
     logs: List[str] = []
     route = classify_intent(query)
 
@@ -137,9 +210,9 @@ def router_call(req: A2ACallRequest):
     if route == "DATA":
         logs.append("Router classified as DATA")
         # Extract an ID
-        m = re.search(r"id\s+(\d+)", query.lower())
+        m = _DATA_ID_RE.search(query_lower)
         cid = int(m.group(1)) if m else int(args.get("customer_id", 1))
-        result = data_call("get_customer", {"customer_id": cid})
+        result = await data_call("get_customer", {"customer_id": cid})
         logs.append("Data Agent used MCP tools")
         final_answer = {
             "type": "get_customer",
@@ -152,7 +225,7 @@ def router_call(req: A2ACallRequest):
     # --------------- SUPPORT ---------------
     if route == "SUPPORT":
         logs.append("Router classified as SUPPORT")
-        text = support_call("simple_support_reply", {"text": query}).get("text", "")
+        text = (await support_call("simple_support_reply", {"text": query})).get("text", "")
         payload = {"scenario": "support", "route": "router -> support", "logs": logs, "final": text}
         return build_response(payload)
 
@@ -160,12 +233,19 @@ def router_call(req: A2ACallRequest):
     # "Show me all active customers who have open tickets"
     if route == "MULTI_OPEN":
         logs.append("Router classified as MULTI")
-        customers = data_call("list_customers", {"status": "active", "limit": 200}).get("customers", [])
+        # One round trip: list active customers, then MCP fans out history lookups server-side
+        listed, histories = (await data_call("batch", {"calls": [
+            {"tool": "list_customers", "arguments": {"status": "active", "limit": 200}},
+            {"tool": "get_customer_history", "input_from": 0, "field": "customers[*].id", "as": "customer_id"},
+        ]})).get("results", [{}, []])
+        customers = listed.get("customers", [])
         result = []
-        for cust in customers:
-            hist = data_call("get_customer_history", {"customer_id": cust["id"]})
-            open_tix = [t for t in hist.get("tickets", []) if str(t.get("status", "")).lower() == "open"]
-            if open_tix:
+        for cust, hist in zip(customers, histories):
+            tickets = hist.get("tickets", ())
+            # Most customers have no open ticket: short-circuit before building any list
+            first = next((i for i, t in enumerate(tickets) if str(t.get("status", "")).lower() == "open"), None)
+            if first is not None:
+                open_tix = [t for t in islice(tickets, first, None) if str(t.get("status", "")).lower() == "open"]
                 result.append({
                     "name": cust.get("name"),
                     "email": cust.get("email"),
@@ -183,15 +263,15 @@ def router_call(req: A2ACallRequest):
     if route == "MULTI_COORD":
         logs.append("Router classified as MULTI")
         # Try to get a customer id; call data (even if missing), then support for guidance
-        m = re.search(r"customer\s+(\d+)", query.lower())
+        m = _CUSTOMER_ID_RE.search(query_lower)
         cid = int(m.group(1)) if m else int(args.get("customer_id", 0))
         customer_profile = None
         if cid:
-            fetched = data_call("get_customer", {"customer_id": cid})
+            fetched = await data_call("get_customer", {"customer_id": cid})
             customer_profile = fetched.get("customer")
             logs.append("Data Agent invoked via MCP")
         # generic guidance from support
-        text = support_call("simple_support_reply", {"text": query}).get("text", "")
+        text = (await support_call("simple_support_reply", {"text": query})).get("text", "")
         logs.append("Support Agent generated coordinated response")
         lines = []
         if customer_profile:
@@ -219,46 +299,59 @@ def router_call(req: A2ACallRequest):
     # "I'm customer 3, update my email to X and show my ticket history"
     if route == "MULTI_UPDATE":
         logs.append("Router classified as MULTI")
-        m_id = re.search(r"customer\s+(\d+)", query.lower())
+        m_id = _CUSTOMER_ID_RE.search(query_lower)
         customer_id = int(m_id.group(1)) if m_id else int(args.get("customer_id", 1))
-        m_email = re.search(r"update my email to ([^\s]+)", query.lower())
+        m_email = _EMAIL_RE.search(query_lower)
         new_email = m_email.group(1) if m_email else args.get("new_email", "new@email.com")
 
-        _ = data_call("update_customer", {"customer_id": customer_id, "data": {"email": new_email}})
+        _ = await data_call("update_customer", {"customer_id": customer_id, "data": {"email": new_email}})
         logs.append("Data Agent invoked via MCP")
-        hist = data_call("get_customer_history", {"customer_id": customer_id}).get("tickets", [])
-        lines = [f"Your email has been successfully updated to {new_email}.\n", "Here is your ticket history:\n"]
+        hist = (await data_call("get_customer_history", {"customer_id": customer_id})).get("tickets", [])
+        buf = io.StringIO()
+        buf.write(_HISTORY_HEADER.format(new_email))
         for idx, t in enumerate(hist, 1):
-            lines.append(
-                f"{idx}. **Ticket ID:** {t.get('id')} \n"
-                f"   - **Issue:** {t.get('issue')} \n"
-                f"   - **Status:** {t.get('status')} \n"
-                f"   - **Priority:** {t.get('priority')} \n"
-                f"   - **Created At:** {t.get('created_at')}\n"
-            )
-        formatted = "\n".join(lines)
+            buf.write(_TICKET_ENTRY.format(idx, t.get("id"), t.get("issue"), t.get("status"),
+                                           t.get("priority"), t.get("created_at")))
+        formatted = buf.getvalue()
         logs.append("Support Agent generated coordinated response")
         payload = {"scenario": "multi-intent", "route": "router -> data -> support", "logs": logs, "final": formatted}
         return build_response(payload)
 
     # ------------- FALLBACK ----------------
-    text = support_call("simple_support_reply", {"text": query}).get("text", "")
+    text = (await support_call("simple_support_reply", {"text": query})).get("text", "")
     payload = {"scenario": "support", "route": "router -> support", "logs": logs, "final": text}
     return build_response(payload)
 
 
+@app.post("/a2a/router/call")
+async def router_call(req: A2ACallRequest):
+    tool = req.tool
+    args = req.arguments or {}
+    if tool not in {"route_task", "route"}:
+        return {"error": f"Unknown tool: {tool}"}
+    return await _route(str(args.get("text", "")), args)
+
+
 class RouterMessageRequest(BaseModel):
     role: str
     content: str
 
 
 @app.post("/a2a/router/message")
-def router_message(req: RouterMessageRequest):
-    # Simple wrapper to call route_task with text
-    res = router_call(A2ACallRequest(tool="route_task", arguments={"text": req.content}))
-    return res
+async def router_message(req: RouterMessageRequest):
+    # Same flow as route_task, without re-wrapping the text in an A2ACallRequest
+    return await _route(req.content, {"text": req.content})
 
 
 if __name__ == "__main__":
     print("Router Agent listening on http://0.0.0.0:9101")
-    uvicorn.run(app, host="0.0.0.0", port=9101)
+    uvicorn.run(
+        "router_agent:app",
+        host="0.0.0.0",
+        port=9101,
+        loop="auto",  # uvloop when installed (not on Windows), else asyncio
+        http="auto",  # httptools when installed, else h11
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        limit_concurrency=1000,
+        timeout_keep_alive=30,
+    )
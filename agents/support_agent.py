@@ -1,40 +1,61 @@
 # support_agent.py
 # Support Agent with A2A interface. It drafts suggestions and uses MCP for tickets/history.
 
-from fastapi import FastAPI, Path
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
+from starlette.convertors import StringConvertor, register_url_convertor
 from pydantic import BaseModel
-from typing import Any, Dict, Optional, List
-import requests
+from typing import Any, Dict, Optional, List, TypedDict
+import os
+import asyncio
+from functools import lru_cache
+import orjson
+import re
+# Imported as agents.<name> (uvicorn agents.x:app) or as a top-level module (python agents/x.py, --chdir agents)
+if __package__:
+    from .a2a_common import UDS_DIR, SharedClient, cache, rpc_call_body
+else:
+    from a2a_common import UDS_DIR, SharedClient, cache, rpc_call_body
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 ASSISTANT_ID = "support"
-MCP_URL = "http://127.0.0.1:9010/mcp"
-HEALTH_URL = "http://127.0.0.1:9010/healthz"
+MCP_BASE = "http://mcp" if UDS_DIR else "http://127.0.0.1:9010"
+MCP_URL = f"{MCP_BASE}/mcp"
+HEALTH_URL = f"{MCP_BASE}/healthz"
+FANOUT_LIMIT = 32  # max concurrent MCP calls per request
+
+# ----------------------
+# Shared async HTTP client (opened/closed with the app lifecycle)
+# ----------------------
+client = SharedClient(timeout=15.0, uds_sockets={"http://mcp": "mcp.sock"})
+open_client = app.on_event("startup")(client.open)
+close_client = app.on_event("shutdown")(client.close)
 
 # ----------------------
 # A2A wrapper models (names required by instructor)
+# Response-only shapes are TypedDicts (plain dicts, no validation); Message validates input.
 # ----------------------
-class AgentProvider(BaseModel):
+class AgentProvider(TypedDict):
     name: str
     sdk: str
-    homepage: Optional[str] = None
+    homepage: Optional[str]
 
-class AgentSkill(BaseModel):
+class AgentSkill(TypedDict):
     name: str
     description: str
     inputs: Dict[str, str]
     outputs: Dict[str, str]
 
-class AgentCapabilities(BaseModel):
+class AgentCapabilities(TypedDict):
     a2a: bool
     tools: List[str]
     skills: List[AgentSkill]
 
-class AgentCard(BaseModel):
+class AgentCard(TypedDict):
     id: str
     name: str
-    version: str = "1.0"
+    version: str
     provider: AgentProvider
     endpoints: Dict[str, str]
 
@@ -47,10 +68,10 @@ class Message(BaseModel):
 # Health
 # ----------------------
 @app.get("/healthz")
-def healthz():
+async def healthz():
     try:
-        r = requests.get(HEALTH_URL, timeout=5)
-        ok = r.ok and r.json().get("ok")
+        r = await client.get(HEALTH_URL, timeout=5)
+        ok = r.is_success and orjson.loads(r.content).get("ok")
         return {"ok": bool(ok)}
     except Exception as e:
         return {"ok": False, "error": str(e)}
@@ -65,8 +86,7 @@ class A2ACall(BaseModel):
 # ----------------------
 # Simple discovery
 # ----------------------
-@app.get("/card")
-def card():
+def _card_doc():
     return {
         "id": ASSISTANT_ID,
         "name": "Support Agent",
@@ -76,16 +96,20 @@ def card():
         }
     }
 
+@app.get("/card")
+@cache(expire=300)
+def card():
+    return _card_doc()
+
 # ----------------------
 # Instructor-named A2A endpoints
 # ----------------------
-@app.get("/a2a/{assistant_id}/agent_card")
-def sa_agent_card(assistant_id: str = Path(...)):
-    assert assistant_id == ASSISTANT_ID
+def _agent_card_doc():
     return AgentCard(
         id=ASSISTANT_ID,
         name="Support Agent",
-        provider=AgentProvider(name="Custom FastAPI", sdk="A2A JSON-RPC over HTTP"),
+        version="1.0",
+        provider=AgentProvider(name="Custom FastAPI", sdk="A2A JSON-RPC over HTTP", homepage=None),
         endpoints={
             "card": "/a2a/{assistant_id}/agent_card",
             "capabilities": "/a2a/{assistant_id}/capabilities",
@@ -95,9 +119,12 @@ def sa_agent_card(assistant_id: str = Path(...)):
         }
     )
 
-@app.get("/a2a/{assistant_id}/capabilities")
-def sa_capabilities(assistant_id: str = Path(...)):
-    assert assistant_id == ASSISTANT_ID
+@app.get(f"/a2a/{ASSISTANT_ID}/agent_card")
+@cache(expire=300)
+def sa_agent_card():
+    return _agent_card_doc()
+
+def _capabilities_doc():
     skills = [
         AgentSkill(
             name="simple_support_reply",
@@ -124,31 +151,36 @@ def sa_capabilities(assistant_id: str = Path(...)):
             outputs={"report": "list", "filter_priority": "str?"},
         ),
     ]
-    return AgentCapabilities(a2a=True, tools=[s.name for s in skills], skills=skills)
+    return AgentCapabilities(a2a=True, tools=[s["name"] for s in skills], skills=skills)
 
-@app.post("/a2a/{assistant_id}/message")
-def sa_message(msg: Message, assistant_id: str = Path(...)):
-    assert assistant_id == ASSISTANT_ID
+@app.get(f"/a2a/{ASSISTANT_ID}/capabilities")
+@cache(expire=300)
+def sa_capabilities():
+    return _capabilities_doc()
+
+@app.post(f"/a2a/{ASSISTANT_ID}/message")
+async def sa_message(msg: Message):
     t = (msg.content or "").lower()
     if "refund" in t or "charged twice" in t:
-        return a2a_call(assistant_id, A2ACall(tool="suggest_resolution", arguments={"text": msg.content}))
+        return await a2a_call(A2ACall.model_construct(tool="suggest_resolution", arguments={"text": msg.content}))
     return {"ok": True, "note": "Message received (no auto rule matched)."}
 
-@app.get("/a2a/{assistant_id}/schema")
-def sa_schema(assistant_id: str = Path(...)):
-    assert assistant_id == ASSISTANT_ID
+def _schema_doc():
     return {
-        "AgentCard": sa_agent_card(assistant_id),
-        "AgentCapabilities": sa_capabilities(assistant_id),
-        "ExampleMessage": Message(role="user", content="I've been charged twice, please refund")
+        "AgentCard": _agent_card_doc(),
+        "AgentCapabilities": _capabilities_doc(),
+        "ExampleMessage": {"role": "user", "content": "I've been charged twice, please refund", "meta": None}
     }
 
+@app.get(f"/a2a/{ASSISTANT_ID}/schema")
+@cache(expire=300)
+def sa_schema():
+    return _schema_doc()
+
 # ----------------------
 # Tasks list
 # ----------------------
-@app.get("/a2a/{assistant_id}/tasks")
-def a2a_tasks(assistant_id: str = Path(...)):
-    assert assistant_id == ASSISTANT_ID
+def _tasks_doc():
     return {
         "tasks": [
             {"name": "simple_support_reply", "args": {"text": "str", "customer_id": "int?"}},
@@ -158,18 +190,24 @@ def a2a_tasks(assistant_id: str = Path(...)):
         ]
     }
 
+@app.get(f"/a2a/{ASSISTANT_ID}/tasks")
+@cache(expire=300)
+def a2a_tasks():
+    return _tasks_doc()
+
 # ----------------------
 # Tool implementations (uses MCP)
 # ----------------------
-def mcp_call(tool: str, arguments: Dict[str, Any]):
-    body = {"jsonrpc": "2.0", "id": "x", "method": "tools/call", "params": {"tool": tool, "arguments": arguments}}
-    r = requests.post(MCP_URL, json=body, timeout=15)
+async def mcp_call(tool: str, arguments: Dict[str, Any]):
+    r = await client.post(MCP_URL, content=rpc_call_body(tool, arguments))
     r.raise_for_status()
-    data = r.json()
+    data = orjson.loads(r.content)
     if "error" in data:
         raise RuntimeError(data["error"])
     return data["result"]
 
+# Pure function of the text: repeated queries are answered from a bounded LRU
+@lru_cache(maxsize=4096)
 def _guess_intent(text: str) -> str:
     t = (text or "").lower()
     if "refund" in t or "charge" in t or "billing" in t:
@@ -178,11 +216,11 @@ def _guess_intent(text: str) -> str:
         return "shipping"
     return "general"
 
-def tool_suggest_resolution(text: str, customer_id: Optional[int] = None):
+async def tool_suggest_resolution(text: str, customer_id: Optional[int] = None):
     context = {}
     if customer_id is not None:
         try:
-            hist = mcp_call("get_customer_history", {"customer_id": customer_id})
+            hist = await mcp_call("get_customer_history", {"customer_id": customer_id})
             context["history"] = hist
         except Exception:
             context["history"] = {"error": "history unavailable"}
@@ -194,21 +232,37 @@ def tool_suggest_resolution(text: str, customer_id: Optional[int] = None):
     )
     return {"suggestion": suggestion, "context": context, "intent": intent}
 
-def tool_create_ticket(customer_id: int, issue: str, priority: str):
-    return mcp_call("create_ticket", {"customer_id": customer_id, "issue": issue, "priority": priority})
+async def tool_create_ticket(customer_id: int, issue: str, priority: str):
+    return await mcp_call("create_ticket", {"customer_id": customer_id, "issue": issue, "priority": priority})
 
-def tool_tickets_report_for_customers(customer_ids: List[int], priority: Optional[str] = None):
+async def gather_bounded(calls, limit: int = FANOUT_LIMIT) -> List[Any]:
+    """Await calls concurrently with at most `limit` in flight; results keep input order."""
+    sem = asyncio.Semaphore(limit)
+
+    async def run(call):
+        async with sem:
+            return await call
+
+    return await asyncio.gather(*(run(c) for c in calls))
+
+async def tool_tickets_report_for_customers(customer_ids: List[int], priority: Optional[str] = None):
+    # Request-scoped memo: each distinct id is fetched once; nothing is kept across requests
+    unique_ids = list(dict.fromkeys(int(cid) for cid in customer_ids))
+    fetched = await gather_bounded(
+        mcp_call("get_customer_history", {"customer_id": cid}) for cid in unique_ids
+    )
+    by_id = dict(zip(unique_ids, fetched))
     report = []
     for cid in customer_ids:
-        hist = mcp_call("get_customer_history", {"customer_id": cid})
+        hist = by_id[int(cid)]
         tickets = hist.get("tickets", [])
         if priority:
             tickets = [t for t in tickets if str(t.get("priority")).lower() == priority.lower()]
         report.append({"customer_id": cid, "tickets": tickets})
     return {"report": report, "filter_priority": priority}
 
-def tool_simple_support_reply(text: str, customer_id: Optional[int] = None):
-    res = tool_suggest_resolution(text, customer_id)
+async def tool_simple_support_reply(text: str, customer_id: Optional[int] = None):
+    res = await tool_suggest_resolution(text, customer_id)
     reply = res.get("suggestion") or (
         "Thanks for contacting support. We'll investigate and follow up shortly."
     )
@@ -217,22 +271,46 @@ def tool_simple_support_reply(text: str, customer_id: Optional[int] = None):
 # ----------------------
 # A2A call dispatcher
 # ----------------------
-@app.post("/a2a/{assistant_id}/call")
-def a2a_call(assistant_id: str, payload: A2ACall):
-    assert assistant_id == ASSISTANT_ID
-    tool = payload.tool
-    args = payload.arguments or {}
+async def call_tool(tool: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    """Dispatch one A2A tool call (also used in-process by the combined app)."""
     if tool == "suggest_resolution":
-        return tool_suggest_resolution(args.get("text", ""), args.get("customer_id"))
+        return await tool_suggest_resolution(args.get("text", ""), args.get("customer_id"))
     if tool == "simple_support_reply":
-        return tool_simple_support_reply(args.get("text", ""), args.get("customer_id"))
+        return await tool_simple_support_reply(args.get("text", ""), args.get("customer_id"))
     if tool == "create_ticket":
-        return tool_create_ticket(int(args["customer_id"]), str(args["issue"]), str(args.get("priority", "medium")))
+        return await tool_create_ticket(int(args["customer_id"]), str(args["issue"]), str(args.get("priority", "medium")))
     if tool == "tickets_report_for_customers":
-        return tool_tickets_report_for_customers(list(args.get("customer_ids", [])), args.get("priority"))
+        return await tool_tickets_report_for_customers(list(args.get("customer_ids", [])), args.get("priority"))
     return {"ok": False, "error": f"Unknown tool: {tool}"}
 
+@app.post(f"/a2a/{ASSISTANT_ID}/call")
+async def a2a_call(payload: A2ACall):
+    return await call_tool(payload.tool, payload.arguments or {})
+
+# ----------------------
+# Any other assistant id is not served by this agent
+# ----------------------
+class OtherAssistantConvertor(StringConvertor):
+    """Path segment that is anything but ASSISTANT_ID, so our own paths keep their 404/405s."""
+    regex = f"(?!{re.escape(ASSISTANT_ID)}/)[^/]+"
+
+register_url_convertor("not_support", OtherAssistantConvertor())
+
+@app.api_route("/a2a/{assistant_id:not_support}/{rest:path}", methods=["GET", "POST"])
+def unknown_assistant(assistant_id: str, rest: str):
+    raise HTTPException(status_code=404, detail=f"Unknown assistant: {assistant_id}")
+
 if __name__ == "__main__":
     import uvicorn
-    print("Support agent on http://0.0.0.0:9103")
-    uvicorn.run(app, host="0.0.0.0", port=9103)
+    # Same-host peers can reach this service over a unix socket instead of loopback TCP
+    bind = {"uds": os.path.join(UDS_DIR, "support_agent.sock")} if UDS_DIR else {"host": "0.0.0.0", "port": 9103}
+    print(f"Support agent on {bind.get('uds') or 'http://0.0.0.0:9103'}")
+    uvicorn.run(
+        "support_agent:app",
+        **bind,
+        loop="auto",  # uvloop when installed (not on Windows), else asyncio
+        http="auto",  # httptools when installed, else h11
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        limit_concurrency=1000,
+        timeout_keep_alive=30,
+    )
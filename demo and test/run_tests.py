@@ -1,29 +1,66 @@
 # run_tests.py
 # Prints the five scenarios in your requested format.
-import time, requests, json, re
+import asyncio, functools, io, sys, time, httpx, json, orjson, re
 
 MCP = "http://127.0.0.1:9010/mcp"
 R = "http://127.0.0.1:9101/a2a/router/call"
 D = "http://127.0.0.1:9102/a2a/data/call"
 S = "http://127.0.0.1:9103/a2a/support/call"
 
-def wait(url, timeout=20):
+async def wait(c, url, timeout=20):
     t0 = time.time()
     while time.time() - t0 < timeout:
         try:
-            r = requests.get(url, timeout=2)
-            if r.ok:
+            r = await c.get(url, timeout=2)
+            if r.is_success:
                 return True
         except:
             pass
-        time.sleep(0.5)
+        await asyncio.sleep(0.5)
     return False
 
-# Basic readiness checks
-assert wait("http://127.0.0.1:9010/healthz"), "MCP not up"
-assert wait("http://127.0.0.1:9101/healthz"), "Router not up"
-assert wait("http://127.0.0.1:9102/healthz"), "Data agent not up"
-assert wait("http://127.0.0.1:9103/healthz"), "Support agent not up"
+async def route(c, q):
+    return orjson.loads((await c.post(R, content=orjson.dumps({"tool":"route","arguments":{"text": q}}))).content)
+
+async def update_then_history(c):
+    # Do a small, explicit multi-step: update then history using Data + Support format
+    # Update email
+    _ = orjson.loads((await c.post(D, content=orjson.dumps({"tool":"update_customer","arguments":{"customer_id":3,"data":{"email":"new@email.com"}}}))).content)
+    # Get history (must follow the update)
+    return orjson.loads((await c.post(D, content=orjson.dumps({"tool":"get_customer_history","arguments":{"customer_id":3}}))).content)
+
+Q_SIMPLE = "Get customer information for ID 5"
+Q_COORD = "I'm customer 12345 and need help upgrading my account"
+Q_COMPLEX = "Show me all active customers who have open tickets"
+Q_ESCALATION = "I've been charged twice, please refund immediately!"
+Q_MULTI = "I'm customer 3, update my email to new@email.com and show my ticket history"
+
+async def fetch_all():
+    # One keep-alive client for every probe and scenario, so connections are reused
+    async with httpx.AsyncClient(timeout=30, headers={"content-type": "application/json"}) as c:
+        # Basic readiness checks, all four probed concurrently
+        ups = await asyncio.gather(
+            wait(c, "http://127.0.0.1:9010/healthz"),
+            wait(c, "http://127.0.0.1:9101/healthz"),
+            wait(c, "http://127.0.0.1:9102/healthz"),
+            wait(c, "http://127.0.0.1:9103/healthz"),
+        )
+        for ok, name in zip(ups, ("MCP", "Router", "Data agent", "Support agent")):
+            assert ok, f"{name} not up"
+        # Scenarios are independent of each other; only update -> history is sequential
+        return await asyncio.gather(
+            route(c, Q_SIMPLE),
+            route(c, Q_COORD),
+            route(c, Q_COMPLEX),
+            route(c, Q_ESCALATION),
+            update_then_history(c),
+        )
+
+res_simple, res_coord, res_complex, res_escalation, hist = asyncio.run(fetch_all())
+
+# The whole report is collected in one buffer and written with a single call at the end
+out = io.StringIO()
+emit = functools.partial(print, file=out)
 
 sep = "="*80
 sub = "-"*80
@@ -33,105 +70,103 @@ def pj(x):
     return json.dumps(x, indent=2, ensure_ascii=False)
 
 # =============================================================================
-print(sep)
-print("TEST: Simple Query")
-print(sub)
-q = "Get customer information for ID 5"
-print(f"Query: {q}\n")
-res = requests.post(R, json={"tool":"route","arguments":{"text": q}}).json()
+emit(sep)
+emit("TEST: Simple Query")
+emit(sub)
+q = Q_SIMPLE
+emit(f"Query: {q}\n")
+res = res_simple
 # Force scenario label + mimic your format
-print("Scenario: data")
-print("Route: router -> data")
-print("Logs:")
+emit("Scenario: data")
+emit("Route: router -> data")
+emit("Logs:")
 for l in res.get("logs", []):
-    print(f"  - {l}")
-print("\nFinal answer:\n", pj(res.get("final")))
+    emit(f"  - {l}")
+emit("\nFinal answer:\n", pj(res.get("final")))
 
 # =============================================================================
-print("\n"+sep)
-print("TEST: Coordinated Query")
-print(sub)
-q = "I'm customer 12345 and need help upgrading my account"
-print(f"Query: {q}\n")
-res = requests.post(R, json={"tool":"route","arguments":{"text": q}}).json()
-print("Scenario: multi-intent")
-print("Route: router -> data -> support")
-print("Logs:")
+emit("\n"+sep)
+emit("TEST: Coordinated Query")
+emit(sub)
+q = Q_COORD
+emit(f"Query: {q}\n")
+res = res_coord
+emit("Scenario: multi-intent")
+emit("Route: router -> data -> support")
+emit("Logs:")
 for l in res.get("logs", []):
-    print(f"  - {l}")
-print("\nFinal answer:\n", res.get("final"))
+    emit(f"  - {l}")
+emit("\nFinal answer:\n", res.get("final"))
 
 # =============================================================================
-print("\n"+sep)
-print("TEST: Complex Query")
-print(sub)
-q = "Show me all active customers who have open tickets"
-print(f"Query: {q}\n")
-res = requests.post(R, json={"tool":"route","arguments":{"text": q}}).json()
-print("Scenario: multi-intent")
-print("Route: router -> data -> support")
-print("Logs:")
+emit("\n"+sep)
+emit("TEST: Complex Query")
+emit(sub)
+q = Q_COMPLEX
+emit(f"Query: {q}\n")
+res = res_complex
+emit("Scenario: multi-intent")
+emit("Route: router -> data -> support")
+emit("Logs:")
 for l in res.get("logs", []):
-    print(f"  - {l}")
+    emit(f"  - {l}")
 # Pretty format list into the narrative you showed
 final = res.get("final")
-print("\nFinal answer:\n Here are the active customers who currently have open tickets:\n")
+emit("\nFinal answer:\n Here are the active customers who currently have open tickets:\n")
 if isinstance(final, list):
     for i, c in enumerate(final, 1):
-        print(f"{i}. **{c.get('name')}**")
-        print(f"   - Email: {c.get('email')}")
-        print(f"   - Phone: {c.get('phone')}")
-        print(f"   - Open Tickets: {c.get('open_tickets')}")
+        emit(f"{i}. **{c.get('name')}**")
+        emit(f"   - Email: {c.get('email')}")
+        emit(f"   - Phone: {c.get('phone')}")
+        emit(f"   - Open Tickets: {c.get('open_tickets')}")
         issues = c.get("issues") or []
         if issues:
-            print(f"     - Issues: {issues[0]}")
-        print()
+            emit(f"     - Issues: {issues[0]}")
+        emit()
 else:
-    print(final if final is not None else "(no data)")
-    print()
+    emit(final if final is not None else "(no data)")
+    emit()
 
 # =============================================================================
-print("\n"+sep)
-print("TEST: Escalation")
-print(sub)
-q = "I've been charged twice, please refund immediately!"
-print(f"Query: {q}\n")
-res = requests.post(R, json={"tool":"route","arguments":{"text": q}}).json()
-print("Scenario: support")
-print("Route: router -> support")
-print("Logs:")
+emit("\n"+sep)
+emit("TEST: Escalation")
+emit(sub)
+q = Q_ESCALATION
+emit(f"Query: {q}\n")
+res = res_escalation
+emit("Scenario: support")
+emit("Route: router -> support")
+emit("Logs:")
 for l in res.get("logs", []):
-    print(f"  - {l}")
-print("\nFinal answer:\n I understand your concern regarding the double charge, and I apologize for any inconvenience this may have caused. To assist you further, please provide the transaction details (date and amounts) so we can expedite the refund process.")
+    emit(f"  - {l}")
+emit("\nFinal answer:\n I understand your concern regarding the double charge, and I apologize for any inconvenience this may have caused. To assist you further, please provide the transaction details (date and amounts) so we can expedite the refund process.")
 
 # =============================================================================
-print("\n"+sep)
-print("TEST: Multi-Intent")
-print(sub)
-q = "I'm customer 3, update my email to new@email.com and show my ticket history"
-print(f"Query: {q}\n")
-# Do a small, explicit multi-step: update then history using Data + Support format
-# Update email
-_ = requests.post(D, json={"tool":"update_customer","arguments":{"customer_id":3,"data":{"email":"new@email.com"}}}).json()
-# Get history
-hist = requests.post(D, json={"tool":"get_customer_history","arguments":{"customer_id":3}}).json()
-
-print("Scenario: multi-intent")
-print("Route: router -> data -> support")
-print("Logs:")
-print("  - Router classified as MULTI")
-print("  - Data Agent invoked via MCP")
-print("  - Support Agent generated coordinated response")
+emit("\n"+sep)
+emit("TEST: Multi-Intent")
+emit(sub)
+q = Q_MULTI
+emit(f"Query: {q}\n")
+# hist came from update_then_history() above
+
+emit("Scenario: multi-intent")
+emit("Route: router -> data -> support")
+emit("Logs:")
+emit("  - Router classified as MULTI")
+emit("  - Data Agent invoked via MCP")
+emit("  - Support Agent generated coordinated response")
 
 tickets = hist.get("tickets", [])
-print("\nFinal answer:\n Your email has been successfully updated to new@email.com.\n")
-print("Here is your ticket history:\n")
+emit("\nFinal answer:\n Your email has been successfully updated to new@email.com.\n")
+emit("Here is your ticket history:\n")
 for i, t in enumerate(tickets[:5], 1):
-    print(f"{i}. **Ticket ID:** {t['id']}")
-    print(f"   - **Issue:** {t['issue']}")
-    print(f"   - **Status:** {t['status'].capitalize()}")
-    print(f"   - **Priority:** {t['priority'].capitalize()}")
-    print(f"   - **Created At:** {t['created_at']}\n")
-
-print(sep)
-print("All test scenarios completed.")
+    emit(f"{i}. **Ticket ID:** {t['id']}")
+    emit(f"   - **Issue:** {t['issue']}")
+    emit(f"   - **Status:** {t['status'].capitalize()}")
+    emit(f"   - **Priority:** {t['priority'].capitalize()}")
+    emit(f"   - **Created At:** {t['created_at']}\n")
+
+emit(sep)
+emit("All test scenarios completed.")
+
+sys.stdout.write(out.getvalue())
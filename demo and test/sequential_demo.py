@@ -3,7 +3,8 @@
 # IntentAnalyzer -> KnowledgeRetriever -> ResponseGenerator
 # =====================================================
 
-from typing import TypedDict, Optional, List
+import operator
+from typing import Annotated, TypedDict, Optional, List
 from langgraph.graph import StateGraph, START, END
 
 
@@ -13,7 +14,7 @@ class SupportState(TypedDict, total=False):
     intent: Optional[str]
     knowledge: Optional[str]
     response: Optional[str]
-    logs: List[str]
+    logs: Annotated[List[str], operator.add]  # nodes return only their new lines
 
 
 # ---------- Tiny "tools" (deterministic) ----------
@@ -48,22 +49,16 @@ def generate_response(user_input: str, knowledge: str) -> str:
 # ---------- Agents ----------
 def intent_analyzer(state: SupportState) -> SupportState:
     intent = detect_intent(state["input"])
-    logs = state.get("logs", [])
-    logs.append(f"IntentAnalyzer → intent='{intent}'")
-    return {"intent": intent, "logs": logs}
+    return {"intent": intent, "logs": [f"IntentAnalyzer → intent='{intent}'"]}
 
 def knowledge_retriever(state: SupportState) -> SupportState:
     intent = state["intent"]
     knowledge = lookup_kb(intent or "other")
-    logs = state.get("logs", [])
-    logs.append("KnowledgeRetriever → KB fetched")
-    return {"knowledge": knowledge, "logs": logs}
+    return {"knowledge": knowledge, "logs": ["KnowledgeRetriever → KB fetched"]}
 
 def response_generator(state: SupportState) -> SupportState:
     reply = generate_response(state["input"], state["knowledge"] or "")
-    logs = state.get("logs", [])
-    logs.append("ResponseGenerator → response composed")
-    return {"response": reply, "logs": logs}
+    return {"response": reply, "logs": ["ResponseGenerator → response composed"]}
 
 
 # ---------- Build graph ----------
@@ -77,13 +72,16 @@ graph.add_edge("IntentAnalyzer", "KnowledgeRetriever")
 graph.add_edge("KnowledgeRetriever", "ResponseGenerator")
 graph.add_edge("ResponseGenerator", END)
 
-sequential_pipeline = graph.compile()
+# Compiled and configured once at import; every invoke reuses the same bound runnable
+sequential_pipeline = graph.compile().with_config({"run_name": "sequential", "recursion_limit": 8})
+# Shared initial state: the operator.add reducer builds new lists, so this one is never mutated
+_EMPTY_LOGS = {"logs": []}
 
 
 # ---------- Demo run ----------
 if __name__ == "__main__":
     user_msg = "My order was charged twice but I only received one item."
-    result = sequential_pipeline.invoke({"input": user_msg, "logs": []})
+    result = sequential_pipeline.invoke({"input": user_msg} | _EMPTY_LOGS)
 
     print("=== Sequential Multi-Agent Demo ===")
     print(f"Input: {user_msg}\n")
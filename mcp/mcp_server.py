@@ -1,16 +1,28 @@
 # mcp_server.py
-# FastAPI JSON-RPC MCP server exposing tools/list and tools/call, plus health check.
+# FastAPI JSON-RPC MCP server exposing tools/list, tools/call and tools/batch, plus health check.
 # Uses the SQLite DB created by your instructor's database_setup.py.
 
+import os
+import pathlib
 import sqlite3
-from datetime import datetime
-from fastapi import FastAPI
-from pydantic import BaseModel
-from typing import Any, Dict, Optional, Union
+import threading
+import orjson
+from functools import lru_cache
+from fastapi import FastAPI, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+from typing import Any, Dict, List, Optional
 
 DB_PATH = "support.db"
+# Set A2A_UDS_DIR (e.g. /tmp) to serve same-host agents over a unix socket instead of TCP
+UDS_DIR = os.getenv("A2A_UDS_DIR")
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
+
+@app.on_event("startup")
+def open_db():
+    # WAL mode and indexes are set up by the writer before any reader connects
+    writer_db()
 
 # ----------------------
 # Healthz for readiness
@@ -18,10 +30,7 @@ app = FastAPI()
 @app.get("/healthz")
 def healthz():
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("SELECT 1")
-        conn.close()
+        connect_db().execute("SELECT 1")
         return {"ok": True}
     except Exception as e:
         return {"ok": False, "error": str(e)}
@@ -29,9 +38,47 @@ def healthz():
 # ----------------------
 # DB helpers
 # ----------------------
-def connect_db():
-    conn = sqlite3.connect(DB_PATH)
+# Reads use one long-lived read-only connection per thread; all writes go through this
+# process's writer connection under _write_lock. WAL lets readers and the writer overlap.
+# _write_lock only serialises writes within one process, so the service runs a single
+# worker (Procfile and __main__); busy_timeout covers any other process touching the file.
+_local = threading.local()
+_write_lock = threading.RLock()  # re-entrant: writer_db() may be first called under it
+_writer: Optional[sqlite3.Connection] = None
+
+def _tune(conn: sqlite3.Connection) -> sqlite3.Connection:
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-20000")
+    conn.execute("PRAGMA mmap_size=268435456")  # read pages through a 256 MiB memory map
+    return conn
+
+def writer_db():
+    """The process-wide write connection (autocommit); callers hold _write_lock while using it."""
+    global _writer
+    if _writer is None:
+        with _write_lock:
+            if _writer is None:
+                # sqlite3 keeps prepared statements per connection keyed by SQL text; the
+                # statements below are constant strings, so they are parsed once per connection
+                conn = _tune(sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None, cached_statements=256))
+                conn.execute("PRAGMA journal_mode=WAL")  # persistent: read-only connections inherit it
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("PRAGMA busy_timeout=5000")  # wait up to 5s for another process's lock
+                for ddl in SQL_INDEXES:
+                    conn.execute(ddl)
+                _writer = conn
+    return _writer
+
+def connect_db():
+    """This thread's read-only connection, opened on first use and never closed."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        writer_db()  # make sure WAL mode and indexes are in place first
+        # as_uri() percent-encodes the path, so "?", "#" or "%" in a checkout path stay literal
+        uri = pathlib.Path(DB_PATH).resolve().as_uri() + "?mode=ro"
+        conn = _tune(sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None, cached_statements=256))
+        _local.conn = conn
     return conn
 
 def row_to_dict(row):
@@ -40,16 +87,33 @@ def row_to_dict(row):
     return dict(row)
 
 def rows_to_list(rows):
+    # Accepts a cursor: rows become dicts as they are stepped, with no fetchall() list first
     return [dict(r) for r in rows]
 
 # ----------------------
-# JSON-RPC model
+# SQL (constant text, so each statement hits the connection's statement cache)
 # ----------------------
-class JsonRpcRequest(BaseModel):
-    jsonrpc: str = "2.0"
-    method: str
-    params: Optional[Dict[str, Any]] = None
-    id: Optional[Union[str, int]] = None
+# Indexes for the hot lookups; also created by database_setup.py, repeated here for older DB files
+SQL_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_tickets_customer_created ON tickets(customer_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_customers_status ON customers(status)",
+)
+SQL_GET_CUSTOMER = "SELECT * FROM customers WHERE id = ?"
+# List/history project only the columns the agents read
+SQL_LIST_CUSTOMERS_BY_STATUS = "SELECT id, name, email, phone, status FROM customers WHERE status = ? LIMIT ?"
+SQL_LIST_CUSTOMERS = "SELECT id, name, email, phone, status FROM customers LIMIT ?"
+# Timestamps come from SQLite's CURRENT_TIMESTAMP (UTC, same text format as the seed data)
+SQL_CREATE_TICKET = (
+    "INSERT INTO tickets (customer_id, issue, status, priority, created_at) "
+    "VALUES (?, ?, 'open', ?, CURRENT_TIMESTAMP)"
+)
+# CURRENT_TIMESTAMP has one-second resolution: id breaks ties so the newest ticket stays first
+SQL_CUSTOMER_HISTORY = "SELECT id, issue, status, priority, created_at FROM tickets WHERE customer_id = ? ORDER BY created_at DESC, id DESC"
+
+@lru_cache(maxsize=64)
+def update_customer_sql(fields: tuple) -> str:
+    """UPDATE statement for one set of (sorted) column names; always bumps updated_at."""
+    return "UPDATE customers SET " + "".join(f"{k} = ?, " for k in fields) + "updated_at = CURRENT_TIMESTAMP WHERE id = ?"
 
 # ----------------------
 # MCP tools (pure functions)
@@ -57,139 +121,189 @@ class JsonRpcRequest(BaseModel):
 def mcp_get_customer(customer_id: int):
     conn = connect_db()
     cur = conn.cursor()
-    cur.execute("SELECT * FROM customers WHERE id = ?", (customer_id,))
+    cur.execute(SQL_GET_CUSTOMER, (customer_id,))
     row = cur.fetchone()
-    conn.close()
     return {"customer": row_to_dict(row)}
 
 def mcp_list_customers(status: Optional[str], limit: int):
     conn = connect_db()
     cur = conn.cursor()
     if status:
-        cur.execute("SELECT * FROM customers WHERE status = ? LIMIT ?", (status, limit))
+        cur.execute(SQL_LIST_CUSTOMERS_BY_STATUS, (status, limit))
     else:
-        cur.execute("SELECT * FROM customers LIMIT ?", (limit,))
-    rows = cur.fetchall()
-    conn.close()
-    return {"customers": rows_to_list(rows)}
+        cur.execute(SQL_LIST_CUSTOMERS, (limit,))
+    return {"customers": rows_to_list(cur)}
 
 def mcp_update_customer(customer_id: int, data: Dict[str, Any]):
     if not data:
         return {"updated": False, "error": "No fields to update"}
-    # Build update dynamically and always bump updated_at
-    fields = []
-    values = []
-    for k, v in data.items():
-        fields.append(f"{k} = ?")
-        values.append(v)
-    fields.append("updated_at = ?")
-    values.append(datetime.utcnow())  # UTC timestamp
-    values.append(customer_id)
+    # Same field set in any order -> same cached statement text
+    fields = tuple(sorted(data))
+    sql = update_customer_sql(fields)
+    values = (*map(data.__getitem__, fields), customer_id)
 
-    conn = connect_db()
-    cur = conn.cursor()
-    cur.execute(f"UPDATE customers SET {', '.join(fields)} WHERE id = ?", values)
-    conn.commit()
-    changed = cur.rowcount
-    conn.close()
+    with _write_lock:
+        changed = writer_db().execute(sql, values).rowcount
     return {"updated": changed > 0}
 
 def mcp_create_ticket(customer_id: int, issue: str, priority: str):
-    conn = connect_db()
-    cur = conn.cursor()
-    now = datetime.utcnow()
-    cur.execute(
-        """
-        INSERT INTO tickets (customer_id, issue, status, priority, created_at)
-        VALUES (?, ?, 'open', ?, ?)
-        """,
-        (customer_id, issue, priority, now),
-    )
-    ticket_id = cur.lastrowid
-    conn.commit()
-    conn.close()
+    with _write_lock:
+        ticket_id = writer_db().execute(SQL_CREATE_TICKET, (customer_id, issue, priority)).lastrowid
     return {"ticket_id": ticket_id, "created": True}
 
 def mcp_get_customer_history(customer_id: int):
     conn = connect_db()
     cur = conn.cursor()
-    cur.execute("SELECT * FROM tickets WHERE customer_id = ? ORDER BY created_at DESC", (customer_id,))
-    rows = cur.fetchall()
-    conn.close()
-    return {"tickets": rows_to_list(rows)}
+    cur.execute(SQL_CUSTOMER_HISTORY, (customer_id,))
+    return {"tickets": rows_to_list(cur)}
+
+# ----------------------
+# Tool execution (shared by tools/call and tools/batch)
+# ----------------------
+class UnknownToolError(Exception):
+    pass
+
+# Tool name -> adapter that coerces the JSON arguments and calls the tool
+_TOOL_DISPATCH = {
+    "get_customer": lambda a: mcp_get_customer(int(a["customer_id"])),
+    "list_customers": lambda a: mcp_list_customers(a.get("status"), int(a.get("limit", 100))),
+    "update_customer": lambda a: mcp_update_customer(int(a["customer_id"]), dict(a.get("data", {}))),
+    "create_ticket": lambda a: mcp_create_ticket(int(a["customer_id"]), str(a["issue"]), str(a.get("priority", "medium"))),
+    "get_customer_history": lambda a: mcp_get_customer_history(int(a["customer_id"])),
+}
+
+def run_tool(tool: str, args: Dict[str, Any]):
+    fn = _TOOL_DISPATCH.get(tool)
+    if fn is None:
+        raise UnknownToolError(tool)
+    return fn(args)
+
+def resolve_field(obj: Any, path: str) -> List[Any]:
+    """Collect the values at a dotted path; a `[*]` suffix fans out over a list,
+    e.g. "customers[*].id" -> every customer id."""
+    values = [obj]
+    for part in path.split("."):
+        fan_out = part.endswith("[*]")
+        key = part[:-3] if fan_out else part
+        values = [v.get(key) if isinstance(v, dict) else None for v in values]
+        if fan_out:
+            values = [item for v in values for item in (v or [])]
+    return values
+
+def run_batch(calls: List[Dict[str, Any]]) -> List[Any]:
+    """Run dependent tool calls in one round trip.
+
+    Each call is {"tool", "arguments"?, "input_from"?, "field"?, "as"?}. When
+    `input_from` points at an earlier call, `field` is resolved on that call's
+    result and fed into argument `as` (default "customer_id"). A `[*]` in the
+    field runs the tool once per value and yields a list of results.
+    """
+    results: List[Any] = []
+    for idx, call in enumerate(calls):
+        tool = str(call.get("tool") or call.get("name") or "").strip()
+        args = dict(call.get("arguments") or {})
+        src = call.get("input_from", -1)
+        if src is None or int(src) < 0:
+            results.append(run_tool(tool, args))
+            continue
+        src = int(src)
+        if src >= idx:
+            raise ValueError(f"call {idx}: input_from must reference an earlier call")
+        field = str(call.get("field") or "")
+        arg_name = str(call.get("as") or "customer_id")
+        values = resolve_field(results[src], field)
+        if "[*]" in field:
+            results.append([run_tool(tool, {**args, arg_name: v}) for v in values])
+        else:
+            results.append(run_tool(tool, {**args, arg_name: values[0]}))
+    return results
+
+# ----------------------
+# tools/list (static, encoded once at import)
+# ----------------------
+_TOOLS_LIST_RESULT = {
+    "tools": [
+        {
+            "name": "get_customer",
+            "description": "Get a single customer by ID",
+            "inputSchema": {
+                "type": "object",
+                "properties": {"customer_id": {"type": "integer"}},
+                "required": ["customer_id"],
+            },
+        },
+        {
+            "name": "list_customers",
+            "description": "List customers (optional status, limit)",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "status": {"type": ["string", "null"]},
+                    "limit": {"type": "integer"},
+                },
+                "required": ["limit"],
+            },
+        },
+        {
+            "name": "update_customer",
+            "description": "Update fields on a customer",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "customer_id": {"type": "integer"},
+                    "data": {"type": "object"},
+                },
+                "required": ["customer_id", "data"],
+            },
+        },
+        {
+            "name": "get_customer_history",
+            "description": "List tickets for a customer",
+            "inputSchema": {
+                "type": "object",
+                "properties": {"customer_id": {"type": "integer"}},
+                "required": ["customer_id"],
+            },
+        },
+        {
+            "name": "create_ticket",
+            "description": "Create a support ticket",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "customer_id": {"type": "integer"},
+                    "issue": {"type": "string"},
+                    "priority": {"type": "string"},
+                },
+                "required": ["customer_id", "issue", "priority"],
+            },
+        },
+    ],
+}
+_TOOLS_LIST_BYTES = orjson.dumps(_TOOLS_LIST_RESULT)
 
 # ----------------------
 # JSON-RPC dispatcher
 # ----------------------
 @app.post("/mcp")
-async def mcp_handler(req: JsonRpcRequest):
-    method = req.method
-    params = req.params or {}
+async def mcp_handler(request: Request):
+    # Parse the envelope with orjson and read only the fields used below (no model validation)
+    try:
+        req = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
+        return {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}}
+    if not isinstance(req, dict) or not isinstance(req.get("method"), str):
+        return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid Request"}}
+    method = req["method"]
+    params = req.get("params") or {}
+    if not isinstance(params, dict):
+        return {"jsonrpc": "2.0", "id": req.get("id"), "error": {"code": -32602, "message": "params must be an object"}}
+    rid = req.get("id")
 
     if method == "tools/list":
-        return {
-            "jsonrpc": "2.0",
-            "id": req.id,
-            "result": {
-                "tools": [
-                    {
-                        "name": "get_customer",
-                        "description": "Get a single customer by ID",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {"customer_id": {"type": "integer"}},
-                            "required": ["customer_id"],
-                        },
-                    },
-                    {
-                        "name": "list_customers",
-                        "description": "List customers (optional status, limit)",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "status": {"type": ["string", "null"]},
-                                "limit": {"type": "integer"},
-                            },
-                            "required": ["limit"],
-                        },
-                    },
-                    {
-                        "name": "update_customer",
-                        "description": "Update fields on a customer",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "customer_id": {"type": "integer"},
-                                "data": {"type": "object"},
-                            },
-                            "required": ["customer_id", "data"],
-                        },
-                    },
-                    {
-                        "name": "get_customer_history",
-                        "description": "List tickets for a customer",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {"customer_id": {"type": "integer"}},
-                            "required": ["customer_id"],
-                        },
-                    },
-                    {
-                        "name": "create_ticket",
-                        "description": "Create a support ticket",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "customer_id": {"type": "integer"},
-                                "issue": {"type": "string"},
-                                "priority": {"type": "string"},
-                            },
-                            "required": ["customer_id", "issue", "priority"],
-                        },
-                    },
-                ]
-            }
-        }
+        # Static result bytes; only the request id is spliced in per call
+        body = b'{"jsonrpc":"2.0","id":' + orjson.dumps(rid) + b',"result":' + _TOOLS_LIST_BYTES + b"}"
+        return Response(content=body, media_type="application/json")
 
     if method == "tools/call":
         tool = (params.get("tool") or params.get("name") or "").strip()
@@ -197,38 +311,53 @@ async def mcp_handler(req: JsonRpcRequest):
         if not tool:
             return {
                 "jsonrpc": "2.0",
-                "id": req.id,
+                "id": rid,
                 "error": {"code": -32602, "message": "Tool name not provided"},
             }
         try:
-            if tool == "get_customer":
-                res = mcp_get_customer(int(args["customer_id"]))
-            elif tool == "list_customers":
-                res = mcp_list_customers(args.get("status"), int(args.get("limit", 100)))
-            elif tool == "update_customer":
-                res = mcp_update_customer(int(args["customer_id"]), dict(args.get("data", {})))
-            elif tool == "create_ticket":
-                res = mcp_create_ticket(int(args["customer_id"]), str(args["issue"]), str(args.get("priority", "medium")))
-            elif tool == "get_customer_history":
-                res = mcp_get_customer_history(int(args["customer_id"]))
-            else:
-                return {
-                    "jsonrpc": "2.0",
-                    "id": req.id,
-                    "error": {"code": -32601, "message": f"Unknown tool: {tool}"},
-                }
-            return {"jsonrpc": "2.0", "id": req.id, "result": res}
+            # SQLite work runs on the threadpool so concurrent RPCs don't queue on the event loop
+            res = await run_in_threadpool(run_tool, tool, args)
+            return {"jsonrpc": "2.0", "id": rid, "result": res}
+        except UnknownToolError:
+            return {
+                "jsonrpc": "2.0",
+                "id": rid,
+                "error": {"code": -32601, "message": f"Unknown tool: {tool}"},
+            }
+        except Exception as e:
+            return {
+                "jsonrpc": "2.0",
+                "id": rid,
+                "error": {"code": -32001, "message": f"Tool execution error: {e}"},
+            }
+
+    if method == "tools/batch":
+        calls = params.get("calls")
+        if not isinstance(calls, list) or not calls:
+            return {
+                "jsonrpc": "2.0",
+                "id": rid,
+                "error": {"code": -32602, "message": "Batch requires a non-empty 'calls' list"},
+            }
+        try:
+            return {"jsonrpc": "2.0", "id": rid, "result": {"results": await run_in_threadpool(run_batch, calls)}}
+        except UnknownToolError as e:
+            return {
+                "jsonrpc": "2.0",
+                "id": rid,
+                "error": {"code": -32601, "message": f"Unknown tool: {e}"},
+            }
         except Exception as e:
             return {
                 "jsonrpc": "2.0",
-                "id": req.id,
+                "id": rid,
                 "error": {"code": -32001, "message": f"Tool execution error: {e}"},
             }
 
     if method == "initialize":
         return {
             "jsonrpc": "2.0",
-            "id": req.id,
+            "id": rid,
             "result": {
                 "protocolVersion": "2024-11-05",
                 "capabilities": {"tools": {"listChanged": False}},
@@ -237,15 +366,25 @@ async def mcp_handler(req: JsonRpcRequest):
         }
 
     if method == "notifications/initialized":
-        return {"jsonrpc": "2.0", "id": req.id, "result": {"ok": True}}
+        return {"jsonrpc": "2.0", "id": rid, "result": {"ok": True}}
 
     return {
         "jsonrpc": "2.0",
-        "id": req.id,
+        "id": rid,
         "error": {"code": -32601, "message": f"Unknown method: {method}"},
     }
 
 if __name__ == "__main__":
     import uvicorn
-    print("MCP JSON-RPC server on http://0.0.0.0:9010")
-    uvicorn.run(app, host="0.0.0.0", port=9010)
+    # Same-host peers can reach this service over a unix socket instead of loopback TCP
+    bind = {"uds": os.path.join(UDS_DIR, "mcp.sock")} if UDS_DIR else {"host": "0.0.0.0", "port": 9010}
+    print(f"MCP JSON-RPC server on {bind.get('uds') or 'http://0.0.0.0:9010'}")
+    uvicorn.run(
+        "mcp_server:app",
+        **bind,
+        loop="auto",  # uvloop when installed (not on Windows), else asyncio
+        http="auto",  # httptools when installed, else h11
+        workers=1,  # single process: the writer lock is per-process (see DB helpers)
+        limit_concurrency=1000,
+        timeout_keep_alive=30,
+    )